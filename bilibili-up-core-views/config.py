@@ -11,13 +11,22 @@ OPENAI_API_KEY = "your-openai-api-key"  # 替换为你的OpenAI API Key
 OPENAI_MODEL = "gpt-3.5-turbo"  # OpenAI模型名称
 
 # DeepSeek API配置
-DEEPSEEK_API_KEY =   # 替换为你的DeepSeek API Key
+DEEPSEEK_API_KEY = "your-deepseek-api-key"  # 替换为你的DeepSeek API Key
 DEEPSEEK_MODEL = "deepseek-chat"  # DeepSeek聊天模型
 
 # 硅基流动API配置
 SILICONFLOW_API_KEY = "your-siliconflow-api-key"  # 替换为你的硅基流动API Key
 SILICONFLOW_MODEL = "Qwen/Qwen2-72B-Instruct"  # 硅基流动模型名称
 
+# 多服务商路由配置
+ROUTER_PROVIDERS = ["deepseek", "siliconflow", "openai"]  # 参与路由的服务商，MODEL_TYPE会被排在最前；未配置密钥的会被跳过
+ENABLE_HEDGING = True  # 请求超过p95延迟时向次优服务商发起对冲请求
+HEDGE_MIN_DELAY = 2.0  # 对冲等待的最短时间（秒）
+LATENCY_WINDOW = 50  # 滚动统计延迟和错误率的窗口大小
+PROVIDER_COOLDOWN = 60  # 服务商被限流或错误率过高时的冷却时间（秒）
+PROVIDER_UNAVAILABLE_COOLDOWN = 1800  # 服务商余额不足或密钥无效时的冷却时间（秒），充值后无需重启即可恢复
+ROUTER_CACHE_SIZE = 8  # Web服务最多保留的路由数（每组服务商和密钥一个）
+
 # 数据采集配置
 PAGE_SIZE = 30  # 每页获取的视频数
 MAX_VIDEOS = 100  # 最大处理的视频数量
@@ -27,5 +36,20 @@ DOWNLOAD_AUDIO = False  # 音频下载已禁用
 TEMPERATURE = 0.3  # 温度参数，越低结果越稳定
 MAX_TOKENS = 1024  # 最大生成token数
 
+# 预算模式配置（任一预算不为None时，按优先级处理视频并在预算用尽前停止）
+TIME_BUDGET = None  # 时间预算（秒），例如60
+TOKEN_BUDGET = None  # token预算，例如50000
+PRIORITY_POLICY = "listing"  # 可选值: "listing"、"newest"、"most_viewed" 或 "subtitle_first"
+SUMMARY_RESERVE_SECONDS = 10  # 为生成整体总结预留的时间（秒），最多占时间预算的20%
+
+# 历史结果存储配置
+ENABLE_RESULTS_STORE = True  # 每处理完一个视频就写入SQLite，支持跨UP主、跨批次全文检索
+RESULTS_DB_PATH = "results/results.db"  # 数据库路径，相对路径以项目根目录为基准
+
+# 结果保存配置
+SAVE_PATH = "results"  # 结果保存目录
+SAVE_FORMAT = "excel"  # 可选值: "excel"、"json" 或 "markdown"
+RESULTS_FILENAME = "up_core_views"  # 结果文件名（不含扩展名，保存时追加时间戳）
+
 # 其他配置
 DELAY = 0.1  # 减少请求间隔，提高处理速度
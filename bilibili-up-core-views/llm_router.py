@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+大模型多服务商路由
+
+功能：
+1. 统计每个服务商的滚动延迟和错误率
+2. 每次调用优先发往最快且健康的服务商
+3. 请求过慢时（超过p95延迟）向次优服务商发起对冲请求，取先返回的结果
+4. 遇到余额不足、密钥无效、频率限制等错误时自动切换到其他服务商
+"""
+
+import time
+import threading
+from collections import deque
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+
+
+# 错误类型
+ERROR_AUTH = "auth"  # 密钥无效
+ERROR_QUOTA = "quota"  # 余额不足
+ERROR_RATE_LIMIT = "rate_limit"  # 请求频率过高
+ERROR_OTHER = "other"  # 其他错误（网络超时等）
+
+
+def classify_error(error):
+    """根据异常信息判断错误类型"""
+    error_msg = str(error)
+    lower_msg = error_msg.lower()
+    if "Insufficient Balance" in error_msg or "402" in error_msg or "quota" in lower_msg:
+        return ERROR_QUOTA
+    if "Authentication Fails" in error_msg or "401" in error_msg or "invalid api key" in lower_msg:
+        return ERROR_AUTH
+    if "rate limit" in lower_msg or "Too Many Requests" in error_msg or "429" in error_msg:
+        return ERROR_RATE_LIMIT
+    return ERROR_OTHER
+
+
+class ProviderStats:
+    """单个服务商的滚动统计（线程安全）"""
+
+    def __init__(self, window=50):
+        self.latencies = deque(maxlen=window)  # 最近成功调用的耗时（秒）
+        self.outcomes = deque(maxlen=window)  # 最近调用结果，True表示成功
+        self.cooldown_until = 0.0  # 冷却截止时间，期间不参与路由
+        self.lock = threading.Lock()
+
+    def record_success(self, latency):
+        with self.lock:
+            self.latencies.append(latency)
+            self.outcomes.append(True)
+
+    def record_failure(self):
+        with self.lock:
+            self.outcomes.append(False)
+
+    def error_rate(self):
+        with self.lock:
+            if not self.outcomes:
+                return 0.0
+            return self.outcomes.count(False) / len(self.outcomes)
+
+    def mean_latency(self):
+        """平均延迟，没有样本时返回None"""
+        with self.lock:
+            if not self.latencies:
+                return None
+            return sum(self.latencies) / len(self.latencies)
+
+    def p95_latency(self):
+        """p95延迟，没有样本时返回None"""
+        with self.lock:
+            if not self.latencies:
+                return None
+            ordered = sorted(self.latencies)
+            index = min(len(ordered) - 1, int(len(ordered) * 0.95))
+            return ordered[index]
+
+    def is_healthy(self):
+        return time.time() >= self.cooldown_until
+
+
+class LLMRouter:
+    """在多个OpenAI兼容服务商之间路由对话请求"""
+
+    def __init__(self, providers, hedge=True, hedge_min_delay=2.0,
+                 latency_window=50, cooldown=60, unavailable_cooldown=1800, failure_penalty=30.0):
+        """
+        providers: [(名称, OpenAI客户端, 模型名称), ...]，顺序即默认优先级
+        hedge: 是否启用对冲请求
+        hedge_min_delay: 对冲等待的最短时间（秒），避免样本不足时过早对冲
+        latency_window: 滚动统计窗口大小
+        cooldown: 频率限制或连续出错后的冷却时间（秒）
+        unavailable_cooldown: 余额不足或密钥无效后的冷却时间（秒），充值或更换密钥后可自动恢复
+        failure_penalty: 一次失败调用折算的延迟（秒），按错误率叠加到路由评分上
+        """
+        self.providers = list(providers)
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.cooldown = cooldown
+        self.unavailable_cooldown = unavailable_cooldown
+        self.failure_penalty = failure_penalty
+        self.stats = {name: ProviderStats(latency_window) for name, _, _ in self.providers}
+
+    def provider_names(self):
+        return [name for name, _, _ in self.providers]
+
+    def _score(self, name):
+        """
+        路由评分（预期耗时，秒），越小越优先
+
+        没有延迟样本的服务商延迟视为0以便尽快探测；错误率按failure_penalty叠加，
+        一直失败、从未成功的服务商不会因为没有延迟样本而排在最前
+        """
+        stats = self.stats[name]
+        latency = stats.mean_latency() or 0.0
+        return latency + self.failure_penalty * stats.error_rate()
+
+    def rank_providers(self):
+        """
+        按评分排序健康的服务商，评分相同时保持配置顺序
+
+        所有服务商都在冷却时返回冷却最早结束的一个，只配置了一个密钥时
+        偶发的限流或网络错误不会让后续调用全部直接失败
+        """
+        healthy = [p for p in self.providers if self.stats[p[0]].is_healthy()]
+        if not healthy:
+            return [min(self.providers, key=lambda p: self.stats[p[0]].cooldown_until)]
+        return sorted(healthy, key=lambda p: self._score(p[0]))
+
+    def _call(self, provider, messages, temperature, max_tokens, timeout=None):
+        """调用单个服务商并记录统计；timeout为None时使用客户端默认超时"""
+        name, client, model_name = provider
+        stats = self.stats[name]
+        options = {"timeout": timeout} if timeout is not None else {}
+        start = time.time()
+        try:
+            response = client.chat.completions.create(
+                model=model_name,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                **options
+            )
+        except Exception as e:
+            stats.record_failure()
+            self._handle_error(name, e)
+            raise
+        stats.record_success(time.time() - start)
+        return response
+
+    def _handle_error(self, name, error):
+        """根据错误类型下线或冷却服务商"""
+        stats = self.stats[name]
+        error_type = classify_error(error)
+        if error_type in (ERROR_AUTH, ERROR_QUOTA):
+            stats.cooldown_until = time.time() + self.unavailable_cooldown
+            print(f"服务商 {name} 不可用（{error_type}），{self.unavailable_cooldown} 秒内将自动切换到其他服务商")
+        elif error_type == ERROR_RATE_LIMIT:
+            stats.cooldown_until = time.time() + self.cooldown
+            print(f"服务商 {name} 请求频率过高，冷却 {self.cooldown} 秒")
+        elif stats.error_rate() >= 0.5 and len(stats.outcomes) >= 4:
+            stats.cooldown_until = time.time() + self.cooldown
+            print(f"服务商 {name} 错误率过高，冷却 {self.cooldown} 秒")
+
+    def _hedge_delay(self, name):
+        """对冲等待时间：主服务商的p95延迟，不低于hedge_min_delay"""
+        p95 = self.stats[name].p95_latency()
+        if p95 is None:
+            return None
+        return max(p95, self.hedge_min_delay)
+
+    def _start(self, provider, messages, temperature, max_tokens, timeout):
+        """在独立线程中调用服务商，返回Future；调用方放弃等待后线程仍会跑完并计入统计"""
+        future = Future()
+
+        def run():
+            try:
+                future.set_result(self._call(provider, messages, temperature, max_tokens, timeout))
+            except Exception as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, daemon=True).start()
+        return future
+
+    def chat(self, messages, temperature, max_tokens, timeout=None, hedge=None):
+        """
+        发送对话请求，返回OpenAI格式的响应；所有服务商都失败时抛出最后一个异常
+
+        timeout: 整个调用（含失败切换和对冲）的时间上限（秒），为None时不限制
+        hedge: 是否允许本次调用对冲，为None时使用路由的默认设置；
+               按token预算计费时应关闭，被放弃的对冲请求同样消耗token
+        """
+        candidates = self.rank_providers()
+        hedge = self.hedge if hedge is None else hedge
+        deadline = time.time() + timeout if timeout is not None else None
+        last_error = TimeoutError("大模型调用超时")
+        while candidates:
+            remaining = deadline - time.time() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                break
+
+            primary = candidates.pop(0)
+            delay = self._hedge_delay(primary[0]) if hedge and candidates else None
+            if delay is None or (remaining is not None and delay >= remaining):
+                # 不会对冲时直接在调用方线程中请求
+                try:
+                    return self._call(primary, messages, temperature, max_tokens, remaining)
+                except Exception as e:
+                    last_error = e
+                    print(f"服务商 {primary[0]} 调用失败：{str(e)[:100]}")
+            else:
+                # 主请求超过p95仍未返回时，向次优服务商发起对冲请求
+                futures = {self._start(primary, messages, temperature, max_tokens, remaining): primary}
+                done, _ = wait(futures, timeout=delay)
+                if not done:
+                    backup = candidates.pop(0)
+                    print(f"服务商 {primary[0]} 响应较慢，对冲请求 {backup[0]}")
+                    backup_timeout = remaining - delay if remaining is not None else None
+                    futures[self._start(backup, messages, temperature, max_tokens, backup_timeout)] = backup
+
+                # 取最先成功的结果，等待不超过截止时间；其余请求在后台完成并计入统计
+                pending = set(futures)
+                while pending:
+                    wait_timeout = deadline - time.time() if deadline is not None else None
+                    if wait_timeout is not None and wait_timeout <= 0:
+                        raise TimeoutError("大模型调用超时")
+                    done, pending = wait(pending, timeout=wait_timeout, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        try:
+                            return future.result()
+                        except Exception as e:
+                            last_error = e
+                            print(f"服务商 {futures[future][0]} 调用失败：{str(e)[:100]}")
+
+            # 本轮全部失败，在剩余健康服务商中继续尝试
+            candidates = [p for p in candidates if self.stats[p[0]].is_healthy()]
+
+        raise last_error
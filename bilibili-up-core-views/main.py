@@ -13,10 +13,16 @@ B站UP主视频核心观点自动提炼工具
 import os
 import time
 import json
+import hashlib
+import threading
+from collections import OrderedDict
+import pandas as pd
 from bilibili_api import user, video, sync
 
 # 导入配置
 from config import *
+from llm_router import LLMRouter
+from results_store import ResultsStore
 
 # 尝试导入OpenAI库
 try:
@@ -27,49 +33,172 @@ except ImportError:
     print("警告：OpenAI库未安装，请先安装：pip install openai")
 
 
+# 按预算处理时可选的优先级策略
+PRIORITY_POLICIES = {
+    "listing": "按视频列表顺序",
+    "newest": "最新发布优先",
+    "most_viewed": "播放量最高优先",
+    "subtitle_first": "有字幕的视频优先"
+}
+
+
+# 按服务商和密钥组合共享的路由，Web服务的多个请求共用滚动统计、对冲阈值和冷却状态；
+# 前端可以传入任意密钥，按最近使用保留ROUTER_CACHE_SIZE个，避免路由和密钥无限累积
+_routers = OrderedDict()
+_routers_lock = threading.Lock()
+
+# 进程内共享的历史结果存储，建表和补建索引只在首次使用时执行一次
+_results_store = None
+_results_store_lock = threading.Lock()
+
+
 def ensure_directory(path):
     """确保目录存在，不存在则创建"""
     if not os.path.exists(path):
         os.makedirs(path)
 
 
+def get_results_store():
+    """获取共享的历史结果存储，未启用时返回None"""
+    global _results_store
+    if not ENABLE_RESULTS_STORE:
+        return None
+    with _results_store_lock:
+        if _results_store is None:
+            _results_store = ResultsStore(RESULTS_DB_PATH)
+        return _results_store
+
+
 class BilibiliUpCrawler:
     """B站UP主视频爬虫类"""
     
-    def __init__(self, up_mid, max_videos=MAX_VIDEOS):
+    def __init__(self, up_mid, max_videos=MAX_VIDEOS, model_type=None, api_keys=None):
         self.up_mid = up_mid
         self.max_videos = max_videos
         self.videos = []
         self.results = []
+        self.model_type = model_type or MODEL_TYPE
+        self.api_keys = api_keys or {}
         
-        # 初始化大模型客户端
+        # 初始化大模型客户端（多服务商路由）
         self.model_client = self._init_model_client()
         
+        # 大模型累计消耗的token数，用于token预算
+        self.tokens_used = 0
+        
+        # 预算模式下的截止时间，网络请求的超时不超过剩余时间
+        self.deadline = None
+        # token预算模式下关闭对冲，被放弃的对冲请求同样消耗token但无法计入
+        self.allow_hedging = True
+        
         # 音频下载已禁用，不再初始化Whisper模型
         self.whisper_model = None
+        
+        # 历史结果存储，处理完的视频增量写入
+        self.results_store = self._init_results_store()
+    
+    def _init_results_store(self):
+        """初始化历史结果存储"""
+        try:
+            return get_results_store()
+        except Exception as e:
+            print(f"警告：历史结果存储初始化失败：{e}")
+            return None
     
     def _init_model_client(self):
-        """初始化大模型客户端"""
+        """初始化大模型客户端：为所有已配置密钥的服务商建立路由"""
         if not OPENAI_AVAILABLE:
             print("警告：OpenAI库未安装，请先安装：pip install openai")
             return None
         
         # 简化模型初始化，只保留核心模型
         model_configs = {
-            "openai": {"api_key": OPENAI_API_KEY, "base_url": None},
-            "deepseek": {"api_key": DEEPSEEK_API_KEY, "base_url": "https://api.deepseek.com/v1"},
-            "siliconflow": {"api_key": SILICONFLOW_API_KEY, "base_url": "https://api.siliconflow.cn/v1"}
+            "openai": {"api_key": OPENAI_API_KEY, "base_url": None, "model": OPENAI_MODEL},
+            "deepseek": {"api_key": DEEPSEEK_API_KEY, "base_url": "https://api.deepseek.com/v1", "model": DEEPSEEK_MODEL},
+            "siliconflow": {"api_key": SILICONFLOW_API_KEY, "base_url": "https://api.siliconflow.cn/v1", "model": SILICONFLOW_MODEL}
         }
         
-        if MODEL_TYPE in model_configs:
-            config = model_configs[MODEL_TYPE]
-            if config["base_url"]:
-                return OpenAI(api_key=config["api_key"], base_url=config["base_url"])
-            else:
-                return OpenAI(api_key=config["api_key"])
-        else:
-            print(f"警告：不支持的模型类型：{MODEL_TYPE}")
+        if self.model_type not in model_configs:
+            print(f"警告：不支持的模型类型：{self.model_type}")
             return None
+        
+        # 首选模型排在最前，其余按ROUTER_PROVIDERS顺序作为备用
+        provider_names = [self.model_type] + [name for name in ROUTER_PROVIDERS if name != self.model_type]
+        
+        # 收集已配置密钥的服务商：(名称, 密钥, base_url, 模型名称)
+        provider_configs = []
+        for name in provider_names:
+            if name not in model_configs:
+                print(f"警告：不支持的模型类型：{name}")
+                continue
+            config = model_configs[name]
+            api_key = self.api_keys.get(name) or config["api_key"]
+            # 跳过未填写的占位密钥
+            if not api_key or api_key.startswith("your-"):
+                continue
+            provider_configs.append((name, api_key, config["base_url"], config["model"]))
+        
+        if not provider_configs:
+            print("警告：没有配置有效的API密钥，请检查config.py")
+            return None
+        
+        # 相同的服务商和密钥组合复用已有路由，缓存键中只保存密钥的摘要
+        router_key = tuple(
+            (name, hashlib.sha256(api_key.encode("utf-8")).hexdigest(), base_url, model_name)
+            for name, api_key, base_url, model_name in provider_configs
+        )
+        with _routers_lock:
+            if router_key in _routers:
+                _routers.move_to_end(router_key)
+                return _routers[router_key]
+            
+            providers = []
+            for name, api_key, base_url, model_name in provider_configs:
+                if base_url:
+                    client = OpenAI(api_key=api_key, base_url=base_url)
+                else:
+                    client = OpenAI(api_key=api_key)
+                providers.append((name, client, model_name))
+            
+            print(f"大模型服务商路由：{', '.join(name for name, _, _ in providers)}")
+            router = LLMRouter(
+                providers,
+                hedge=ENABLE_HEDGING,
+                hedge_min_delay=HEDGE_MIN_DELAY,
+                latency_window=LATENCY_WINDOW,
+                cooldown=PROVIDER_COOLDOWN,
+                unavailable_cooldown=PROVIDER_UNAVAILABLE_COOLDOWN
+            )
+            _routers[router_key] = router
+            if len(_routers) > ROUTER_CACHE_SIZE:
+                _routers.popitem(last=False)
+            return router
+    
+    def _remaining_time(self):
+        """距截止时间的剩余秒数，用作网络请求超时；不限时间时返回None"""
+        if self.deadline is None:
+            return None
+        # 至少保留1秒，避免超时为0导致请求立即失败
+        return max(self.deadline - time.time(), 1.0)
+    
+    def _chat(self, prompt):
+        """通过路由调用大模型，返回生成的文本"""
+        response = self.model_client.chat(
+            messages=[{"role": "user", "content": prompt}],
+            temperature=TEMPERATURE,
+            max_tokens=MAX_TOKENS,
+            timeout=self._remaining_time(),
+            hedge=None if self.allow_hedging else False
+        )
+        content = response.choices[0].message.content.strip()
+        
+        # 统计token消耗，服务商未返回usage时按字符数估算
+        usage = getattr(response, "usage", None)
+        if usage and getattr(usage, "total_tokens", None):
+            self.tokens_used += usage.total_tokens
+        else:
+            self.tokens_used += len(prompt) + len(content)
+        return content
     
     def get_up_videos(self):
         """获取UP主的视频列表"""
@@ -130,17 +259,20 @@ class BilibiliUpCrawler:
                         bvid_val = video.get("bvid", "")
                         title_val = video.get("title", "")
                         desc_val = video.get("desc", "")
+                        play_val = video.get("play", 0)
                     else:
                         bvid_val = video.bvid if hasattr(video, 'bvid') else ""
                         title_val = video.title if hasattr(video, 'title') else ""
                         desc_val = video.desc if hasattr(video, 'desc') else ""
+                        play_val = video.play if hasattr(video, 'play') else 0
                     
                     video_info = {
                         "bvid": bvid_val,  # 视频唯一标识
                         "title": title_val,  # 视频标题
                         "url": f"https://www.bilibili.com/video/{bvid_val}",  # 视频链接
                         "desc": desc_val,  # 视频简介，兼容可能的缺失字段
-                        "pubdate": pubdate  # 发布时间
+                        "pubdate": pubdate,  # 发布时间
+                        "play": play_val  # 播放量，用于按播放量排序
                     }
                     self.videos.append(video_info)
                     total_videos += 1
@@ -175,18 +307,21 @@ class BilibiliUpCrawler:
                                 bvid_val = video.get("bvid", "")
                                 title_val = video.get("title", "")
                                 desc_val = video.get("desc", "")
+                                play_val = video.get("play", 0)
                             else:
                                 pubdate = video.pubdate if hasattr(video, 'pubdate') else 0
                                 bvid_val = video.bvid if hasattr(video, 'bvid') else ""
                                 title_val = video.title if hasattr(video, 'title') else ""
                                 desc_val = video.desc if hasattr(video, 'desc') else ""
+                                play_val = video.play if hasattr(video, 'play') else 0
                             
                             video_info = {
                                 "bvid": bvid_val,
                                 "title": title_val,
                                 "url": f"https://www.bilibili.com/video/{bvid_val}",
                                 "desc": desc_val,
-                                "pubdate": pubdate
+                                "pubdate": pubdate,
+                                "play": play_val
                             }
                             self.videos.append(video_info)
                             total_videos += 1
@@ -226,7 +361,7 @@ class BilibiliUpCrawler:
             
             # 下载字幕
             import requests
-            response = requests.get(subtitle_url)
+            response = requests.get(subtitle_url, timeout=self._remaining_time())
             if response.status_code != 200:
                 print(f"下载字幕失败：{response.status_code}")
                 return None
@@ -292,21 +427,8 @@ class BilibiliUpCrawler:
             视频文本：{text[:1500]}  # 只取前1500字，提高处理速度
             """
             
-            # 根据模型类型选择正确的模型名称
-            model_name = OPENAI_MODEL
-            if MODEL_TYPE == "deepseek":
-                model_name = DEEPSEEK_MODEL
-            elif MODEL_TYPE == "siliconflow":
-                model_name = SILICONFLOW_MODEL
-            
-            # 调用模型API（所有模型使用统一的OpenAI兼容接口）
-            response = self.model_client.chat.completions.create(
-                model=model_name,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=TEMPERATURE,
-                max_tokens=MAX_TOKENS
-            )
-            return response.choices[0].message.content.strip()
+            # 调用模型API（由路由选择最快的健康服务商，失败时自动切换）
+            return self._chat(prompt)
             
         except Exception as e:
             error_msg = str(e)
@@ -314,12 +436,9 @@ class BilibiliUpCrawler:
             
             # 提供更详细的错误说明
             if "Authentication Fails" in error_msg or "invalid" in error_msg.lower() or "401" in error_msg:
-                if MODEL_TYPE == "siliconflow":
-                    return f"核心观点提取失败：API密钥无效，请检查config.py中的SILICONFLOW_API_KEY设置是否正确"
-                elif MODEL_TYPE == "deepseek":
-                    return f"核心观点提取失败：API密钥无效，请检查config.py中的DEEPSEEK_API_KEY设置是否正确"
-                else:
-                    return f"核心观点提取失败：API密钥无效，请检查config.py中的{MODEL_TYPE.upper()}_API_KEY设置是否正确"
+                # 路由已尝试所有服务商，提示检查全部参与路由的密钥
+                key_names = "、".join(f"{name.upper()}_API_KEY" for name in self.model_client.provider_names())
+                return f"核心观点提取失败：API密钥无效，请检查config.py中的{key_names}设置是否正确"
             elif "Insufficient Balance" in error_msg:
                 return f"核心观点提取失败：API余额不足，请充值或更换API密钥"
             elif "rate limit" in error_msg.lower() or "Too Many Requests" in error_msg:
@@ -327,8 +446,8 @@ class BilibiliUpCrawler:
             else:
                 return f"核心观点提取失败：{error_msg[:100]}"
     
-    def process_video(self, video_info):
-        """处理单个视频：获取文本 → 清洗 → 提取核心观点"""
+    def process_video(self, video_info, text=None):
+        """处理单个视频：获取文本 → 清洗 → 提取核心观点；text为已获取的文本时不再请求字幕"""
         bvid = video_info["bvid"]
         title = video_info["title"]
         
@@ -336,7 +455,8 @@ class BilibiliUpCrawler:
         print(f"视频链接：{video_info['url']}")
         
         # 1. 尝试获取字幕
-        text = self.get_video_subtitle(bvid)
+        if text is None:
+            text = self.get_video_subtitle(bvid)
         
         # 2. 如果没有字幕，使用标题和简介作为文本来源
         if not text:
@@ -362,6 +482,14 @@ class BilibiliUpCrawler:
         }
         
         self.results.append(result)
+        
+        # 6. 写入历史结果存储（提取失败的结果不入库）
+        if self.results_store and not core_view.startswith("核心观点提取失败"):
+            try:
+                self.results_store.add_result(self.up_mid, video_info, core_view)
+            except Exception as e:
+                print(f"写入历史结果失败：{e}")
+        
         print(f"视频 {bvid} 处理完成")
         return result
     
@@ -389,21 +517,8 @@ class BilibiliUpCrawler:
             {all_core_views}
             """
             
-            # 根据模型类型选择正确的模型名称
-            model_name = OPENAI_MODEL
-            if MODEL_TYPE == "deepseek":
-                model_name = DEEPSEEK_MODEL
-            elif MODEL_TYPE == "siliconflow":
-                model_name = SILICONFLOW_MODEL
-            
             # 调用模型API
-            response = self.model_client.chat.completions.create(
-                model=model_name,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=TEMPERATURE,
-                max_tokens=MAX_TOKENS
-            )
-            return response.choices[0].message.content.strip()
+            return self._chat(prompt)
             
         except Exception as e:
             print(f"生成整体总结失败：{e}")
@@ -435,21 +550,8 @@ class BilibiliUpCrawler:
             用户问题：{question}
             """
             
-            # 根据模型类型选择正确的模型名称
-            model_name = OPENAI_MODEL
-            if MODEL_TYPE == "deepseek":
-                model_name = DEEPSEEK_MODEL
-            elif MODEL_TYPE == "siliconflow":
-                model_name = SILICONFLOW_MODEL
-            
             # 调用模型API
-            response = self.model_client.chat.completions.create(
-                model=model_name,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=TEMPERATURE,
-                max_tokens=MAX_TOKENS
-            )
-            return response.choices[0].message.content.strip()
+            return self._chat(prompt)
             
         except Exception as e:
             print(f"回答问题失败：{e}")
@@ -470,6 +572,107 @@ class BilibiliUpCrawler:
         
         print(f"\n所有视频处理完成，共处理 {len(self.results)} 个视频")
     
+    def prioritize_videos(self, priority=PRIORITY_POLICY):
+        """按优先级策略排序视频列表"""
+        if priority not in PRIORITY_POLICIES:
+            raise ValueError(f"不支持的优先级策略：{priority}，可选值：{', '.join(PRIORITY_POLICIES)}")
+        
+        if priority == "newest":
+            return sorted(self.videos, key=lambda v: v["pubdate"] or 0, reverse=True)
+        if priority == "most_viewed":
+            # 播放量可能为"--"等非数字值（如付费视频），按0处理
+            return sorted(self.videos, key=lambda v: v["play"] if isinstance(v.get("play"), int) else 0, reverse=True)
+        # listing和subtitle_first保持列表顺序，subtitle_first在处理时把无字幕视频延后
+        return list(self.videos)
+    
+    def process_videos_with_budget(self, time_budget=None, token_budget=None,
+                                   priority=PRIORITY_POLICY, start_time=None):
+        """
+        在时间/token预算内按优先级处理视频，预算不足时停止并返回覆盖率统计
+        
+        time_budget: 时间预算（秒），从start_time开始计算，为None时不限时间
+        token_budget: token预算，为None时不限token
+        priority: 优先级策略，见PRIORITY_POLICIES
+        start_time: 计时起点，默认为调用时刻；Web接口传入请求开始时间，使获取视频列表的耗时也计入预算
+        """
+        start_time = start_time or time.time()
+        queue = self.prioritize_videos(priority)
+        self.deadline = start_time + time_budget if time_budget is not None else None
+        self.allow_hedging = token_budget is None
+        # 总结预留时间不超过预算的20%，避免较小的预算一个视频都处理不了
+        reserve_seconds = min(SUMMARY_RESERVE_SECONDS, time_budget * 0.2) if time_budget is not None else 0
+        # 没有字幕的视频及其备用文本，subtitle_first策略下放到最后处理
+        deferred = []
+        attempted = 0  # 已调用提取的视频数（含失败）
+        processed = 0  # 成功提取核心观点的视频数
+        checks = 0  # subtitle_first策略下已检查字幕的视频数
+        avg_seconds = 0.0
+        avg_check = 0.0
+        avg_tokens = 0
+        stopped_reason = "completed"
+        
+        print(f"\n开始按预算处理 {len(queue)} 个视频（优先级：{priority}，时间预算：{time_budget}秒，token预算：{token_budget}）...")
+        
+        while queue or deferred:
+            # 预测下一步的消耗（subtitle_first策略下还要先检查字幕），并为整体总结预留余量（总结的输入约为已有核心观点的总长度）
+            elapsed = time.time() - start_time
+            next_seconds = avg_seconds + (avg_check if priority == "subtitle_first" and queue else 0)
+            if time_budget is not None and elapsed + next_seconds + reserve_seconds > time_budget:
+                stopped_reason = "time_budget"
+                break
+            if token_budget is not None:
+                summary_tokens = MAX_TOKENS + sum(len(r["核心观点"]) for r in self.results)
+                if self.tokens_used + avg_tokens + summary_tokens > token_budget:
+                    stopped_reason = "token_budget"
+                    break
+            
+            text = None
+            if queue:
+                video_info = queue.pop(0)
+                if priority == "subtitle_first":
+                    # 单独统计字幕检查的耗时，被延后的视频同样消耗这部分时间
+                    check_start = time.time()
+                    text = self.get_video_subtitle(video_info["bvid"])
+                    checks += 1
+                    avg_check += (time.time() - check_start - avg_check) / checks
+                    if not text:
+                        deferred.append((video_info, f"{video_info['title']} {video_info['desc']}"))
+                        continue
+            else:
+                video_info, text = deferred.pop(0)
+            
+            video_start = time.time()
+            tokens_before = self.tokens_used
+            result = self.process_video(video_info, text)
+            
+            # 滚动平均单个视频的耗时和token消耗，失败的视频同样消耗预算
+            attempted += 1
+            avg_seconds += (time.time() - video_start - avg_seconds) / attempted
+            avg_tokens += (self.tokens_used - tokens_before - avg_tokens) / attempted
+            if result and not result["核心观点"].startswith("核心观点提取失败"):
+                processed += 1
+            time.sleep(DELAY)  # 加延时，避免触发API限制
+        
+        elapsed = time.time() - start_time
+        total = len(self.videos)
+        coverage = {
+            "priority": priority,
+            "total_videos": total,
+            "processed_videos": processed,
+            "failed_videos": attempted - processed,
+            "skipped_videos": total - attempted,
+            "coverage": round(processed / total, 4) if total else 0,
+            "elapsed_seconds": round(elapsed, 2),
+            "tokens_used": self.tokens_used,
+            "stopped_reason": stopped_reason
+        }
+        
+        if stopped_reason == "completed":
+            print(f"\n所有视频处理完成，成功 {processed} 个，失败 {attempted - processed} 个，耗时 {elapsed:.1f} 秒")
+        else:
+            print(f"\n预算即将用尽（{stopped_reason}），成功处理 {processed}/{total} 个视频，失败 {attempted - processed} 个，耗时 {elapsed:.1f} 秒")
+        return coverage
+    
     def save_results(self):
         """保存结果"""
         if not self.results:
@@ -477,6 +680,7 @@ class BilibiliUpCrawler:
             return
         
         print(f"\n开始保存结果...")
+        ensure_directory(SAVE_PATH)
         
         # 生成带时间戳的文件名，避免文件被锁定时保存失败
         timestamp = time.strftime("%Y%m%d_%H%M%S", time.localtime())
@@ -516,23 +720,37 @@ class BilibiliUpCrawler:
         else:
             print(f"不支持的保存格式：{SAVE_FORMAT}")
     
-    def run(self):
-        """运行完整流程"""
+    def run(self, time_budget=TIME_BUDGET, token_budget=TOKEN_BUDGET, priority=PRIORITY_POLICY):
+        """
+        运行完整流程；设置了时间或token预算时按优先级处理，预算用尽后保存已完成的部分结果
+        
+        返回{"results": 结果列表, "coverage": 覆盖率统计（仅预算模式）, "overall_summary": 整体总结}
+        """
+        start_time = time.time()
+        coverage = None
+        overall_summary = None
         try:
             # 1. 获取视频列表
             self.get_up_videos()
             
             if not self.videos:
                 print("没有获取到视频，程序结束")
-                return
-            
-            # 2. 处理所有视频
-            self.process_all_videos()
-            
-            # 3. 保存结果
-            self.save_results()
-            
-            print("\n程序执行完成！")
+            else:
+                # 2. 处理视频
+                if time_budget is not None or token_budget is not None:
+                    coverage = self.process_videos_with_budget(time_budget, token_budget, priority, start_time)
+                    print(f"覆盖率：{coverage['processed_videos']}/{coverage['total_videos']}（{coverage['coverage']:.0%}），失败 {coverage['failed_videos']} 个")
+                else:
+                    self.process_all_videos()
+                
+                # 3. 保存结果
+                self.save_results()
+                
+                # 4. 基于已完成的结果生成整体总结
+                overall_summary = self.generate_overall_summary()
+                print(f"\n整体总结：\n{overall_summary}")
+                
+                print("\n程序执行完成！")
             
         except KeyboardInterrupt:
             print("\n程序被用户中断")
@@ -543,7 +761,12 @@ class BilibiliUpCrawler:
             print(f"\n程序执行出错：{e}")
             import traceback
             traceback.print_exc()
-
+        
+        return {
+            "results": self.results,
+            "coverage": coverage,
+            "overall_summary": overall_summary
+        }
 
 if __name__ == "__main__":
     # 初始化爬虫
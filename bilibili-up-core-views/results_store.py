@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+历史提取结果持久化存储（SQLite + FTS5全文索引）
+
+功能：
+1. 每处理完一个视频就增量写入结果，程序中断也不会丢失
+2. 使用FTS5建立全文索引：trigram索引用于3个字及以上的检索词，bigram索引用于中文常见的双字词和单字
+3. 按关键词、UP主和发布日期范围检索，返回按相关度（bm25）排序的摘要片段
+"""
+
+import os
+import re
+import html
+import time
+import sqlite3
+from contextlib import contextmanager
+
+# 相对路径以项目根目录为基准，命令行和Web服务写入同一个数据库
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# trigram分词要求检索词至少3个字符，更短的词（中文常见的双字词、单字）改走bigram索引
+MIN_MATCH_LENGTH = 3
+
+# 连续的字母、数字或汉字
+WORD_RUN = re.compile(r"[^\W_]+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    bvid TEXT NOT NULL UNIQUE,
+    up_mid TEXT NOT NULL,
+    title TEXT NOT NULL,
+    url TEXT NOT NULL,
+    pubdate INTEGER NOT NULL,
+    core_view TEXT NOT NULL,
+    extracted_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_up_pubdate ON results (up_mid, pubdate);
+CREATE INDEX IF NOT EXISTS idx_results_pubdate ON results (pubdate);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS results_fts USING fts5(
+    title, core_view,
+    content='results', content_rowid='id',
+    tokenize='trigram'
+);
+
+-- bigram索引：写入前在Python中切分为空格分隔的双字词，用于1-2个字的检索词
+CREATE VIRTUAL TABLE IF NOT EXISTS results_bigram USING fts5(
+    title, core_view,
+    tokenize='unicode61'
+);
+
+-- 通过触发器保持trigram索引与结果表同步（bigram索引在add_result中同步）
+CREATE TRIGGER IF NOT EXISTS results_ai AFTER INSERT ON results BEGIN
+    INSERT INTO results_fts (rowid, title, core_view) VALUES (new.id, new.title, new.core_view);
+END;
+CREATE TRIGGER IF NOT EXISTS results_ad AFTER DELETE ON results BEGIN
+    INSERT INTO results_fts (results_fts, rowid, title, core_view) VALUES ('delete', old.id, old.title, old.core_view);
+END;
+CREATE TRIGGER IF NOT EXISTS results_au AFTER UPDATE ON results BEGIN
+    INSERT INTO results_fts (results_fts, rowid, title, core_view) VALUES ('delete', old.id, old.title, old.core_view);
+    INSERT INTO results_fts (rowid, title, core_view) VALUES (new.id, new.title, new.core_view);
+END;
+"""
+
+
+def to_bigrams(text):
+    """
+    将文本切分为空格分隔的双字词，每段连续文字末尾补一个单字
+
+    例如"经济学"切分为"经济 济学 学"，这样任意双字词都能精确匹配，
+    单字则通过前缀检索（"经"*）命中以该字开头的双字词或末尾单字
+    """
+    tokens = []
+    for run in WORD_RUN.findall(text.lower()):
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        tokens.append(run[-1])
+    return " ".join(tokens)
+
+
+def fts_phrase(term):
+    """将检索词转为FTS5短语，避免特殊字符被解析为FTS5语法"""
+    return '"' + term.replace('"', '""') + '"'
+
+
+def parse_date(date_str, end_of_day=False):
+    """将YYYY-MM-DD格式的日期转换为时间戳，空值返回None"""
+    if not date_str:
+        return None
+    timestamp = time.mktime(time.strptime(date_str, "%Y-%m-%d"))
+    if end_of_day:
+        timestamp += 24 * 3600 - 1
+    return int(timestamp)
+
+
+def make_snippet(text, terms, width=32):
+    """截取关键词附近的片段，HTML转义后用<mark>标记关键词"""
+    lower = text.lower()
+    positions = [lower.find(term.lower()) for term in terms]
+    positions = [pos for pos in positions if pos >= 0]
+    start = max(0, min(positions) - width // 2) if positions else 0
+
+    # 先截取再转义，避免截断转义后的实体
+    snippet = html.escape(text[start:start + width * 2])
+    if terms:
+        pattern = "|".join(re.escape(html.escape(term)) for term in sorted(terms, key=len, reverse=True))
+        snippet = re.sub(pattern, lambda m: f"<mark>{m.group(0)}</mark>", snippet, flags=re.IGNORECASE)
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if start + width * 2 < len(text) else ""
+    return f"{prefix}{snippet}{suffix}"
+
+
+def contains_any(text, terms):
+    lower = text.lower()
+    return any(term.lower() in lower for term in terms)
+
+
+class ResultsStore:
+    """提取结果存储类"""
+
+    def __init__(self, db_path):
+        if not os.path.isabs(db_path):
+            db_path = os.path.join(BASE_DIR, db_path)
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+        self.db_path = db_path
+
+        with self._connect() as conn:
+            # WAL模式允许检索与写入并发进行
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self._backfill_bigrams(conn)
+
+    @contextmanager
+    def _connect(self):
+        """每次操作使用独立连接（Flask多线程下无需共享连接），退出时提交或回滚并关闭连接"""
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _backfill_bigrams(self, conn):
+        """为建立bigram索引之前写入的结果补建索引"""
+        rows = conn.execute(
+            "SELECT id, title, core_view FROM results WHERE id NOT IN (SELECT rowid FROM results_bigram)"
+        ).fetchall()
+        conn.executemany(
+            "INSERT INTO results_bigram (rowid, title, core_view) VALUES (?, ?, ?)",
+            [(row["id"], to_bigrams(row["title"]), to_bigrams(row["core_view"])) for row in rows]
+        )
+
+    def add_result(self, up_mid, video_info, core_view):
+        """写入单个视频的提取结果；同一视频再次提取时覆盖为最新结果"""
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO results (bvid, up_mid, title, url, pubdate, core_view, extracted_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (bvid) DO UPDATE SET
+                    up_mid = excluded.up_mid,
+                    title = excluded.title,
+                    url = excluded.url,
+                    pubdate = excluded.pubdate,
+                    core_view = excluded.core_view,
+                    extracted_at = excluded.extracted_at
+                """,
+                (
+                    video_info["bvid"],
+                    str(up_mid),
+                    video_info["title"],
+                    video_info["url"],
+                    int(video_info["pubdate"] or 0),
+                    core_view,
+                    int(time.time())
+                )
+            )
+            row_id = conn.execute("SELECT id FROM results WHERE bvid = ?", (video_info["bvid"],)).fetchone()[0]
+
+            # 在同一事务中更新bigram索引
+            conn.execute("DELETE FROM results_bigram WHERE rowid = ?", (row_id,))
+            conn.execute(
+                "INSERT INTO results_bigram (rowid, title, core_view) VALUES (?, ?, ?)",
+                (row_id, to_bigrams(video_info["title"]), to_bigrams(core_view))
+            )
+
+    def _build_query(self, keyword, up_mid, start_date, end_date):
+        """
+        构造检索的FROM、WHERE和排序子句；检索词中有无法检索的词（如只有标点）时返回None
+
+        3个字及以上的检索词走trigram索引，1-2个字的检索词走bigram索引，两者都按bm25排序
+        """
+        terms = keyword.split() if keyword else []
+        long_terms = [t for t in terms if len(t) >= MIN_MATCH_LENGTH]
+        short_terms = [t for t in terms if len(t) < MIN_MATCH_LENGTH]
+
+        tables = ["results r"]
+        conditions = []
+        params = []
+        ranks = []
+        if long_terms:
+            tables.append("JOIN results_fts ON results_fts.rowid = r.id")
+            conditions.append("results_fts MATCH ?")
+            params.append(" AND ".join(fts_phrase(t) for t in long_terms))
+            ranks.append("results_fts.rank")
+        if short_terms:
+            phrases = []
+            for term in short_terms:
+                runs = WORD_RUN.findall(term.lower())
+                if not runs:
+                    return None
+                for run in runs:
+                    # 双字词精确匹配，单字按前缀匹配以该字开头的双字词
+                    phrases.append(fts_phrase(run) if len(run) == 2 else fts_phrase(run) + "*")
+            tables.append("JOIN results_bigram ON results_bigram.rowid = r.id")
+            conditions.append("results_bigram MATCH ?")
+            params.append(" AND ".join(phrases))
+            ranks.append("results_bigram.rank")
+
+        # 有全文检索条件时，在列名前加一元+号使UP主和日期条件不走普通索引，
+        # 由全文索引驱动查询；否则SQLite可能先按UP主扫描，再对每一行重复执行MATCH
+        column = "+r.{}" if ranks else "r.{}"
+        if up_mid:
+            conditions.append(f"{column.format('up_mid')} = ?")
+            params.append(str(up_mid))
+        start_ts = parse_date(start_date)
+        if start_ts is not None:
+            conditions.append(f"{column.format('pubdate')} >= ?")
+            params.append(start_ts)
+        end_ts = parse_date(end_date, end_of_day=True)
+        if end_ts is not None:
+            conditions.append(f"{column.format('pubdate')} <= ?")
+            params.append(end_ts)
+
+        from_clause = " ".join(tables)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        # 没有关键词时按发布时间倒序
+        order_by = " + ".join(ranks) if ranks else "r.pubdate DESC"
+        return from_clause, where, params, order_by, terms
+
+    def search(self, keyword="", up_mid=None, start_date=None, end_date=None, limit=20, offset=0):
+        """
+        检索历史结果
+
+        keyword: 关键词，多个关键词用空格分隔（AND关系）
+        up_mid: 只检索指定UP主
+        start_date/end_date: 发布日期范围，格式为YYYY-MM-DD
+        返回(结果列表, 匹配总数)，结果按相关度排序，没有关键词时按发布时间倒序；
+        snippet字段已做HTML转义，关键词用<mark>标记
+        """
+        query = self._build_query(keyword, up_mid, start_date, end_date)
+        if query is None:
+            return [], 0
+        from_clause, where, params, order_by, terms = query
+
+        with self._connect() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM {from_clause} {where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT r.* FROM {from_clause} {where} ORDER BY {order_by} LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+
+        items = []
+        for row in rows:
+            # 优先从核心观点中截取片段，关键词只出现在标题中时改用标题
+            if terms and not contains_any(row["core_view"], terms) and contains_any(row["title"], terms):
+                snippet = make_snippet(row["title"], terms)
+            else:
+                snippet = make_snippet(row["core_view"], terms)
+            items.append({
+                "bvid": row["bvid"],
+                "up_mid": row["up_mid"],
+                "视频标题": row["title"],
+                "视频链接": row["url"],
+                "发布时间": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(row["pubdate"])),
+                "核心观点": row["core_view"],
+                "snippet": snippet
+            })
+        return items, total
@@ -7,22 +7,31 @@ B站UP主视频核心观点提取工具 - 后端服务
 1. 接收前端请求，获取UP主视频列表
 2. 调用大模型API提取核心观点
 3. 返回处理结果给前端
+4. 检索历史提取结果
 """
 
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import sys
 import os
+import time
 
 # 添加项目根目录到Python路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from main import BilibiliUpCrawler
+from main import BilibiliUpCrawler, PRIORITY_POLICIES, get_results_store
 from config import *
 
 app = Flask(__name__)
 CORS(app)  # 允许跨域请求
 
+# 历史结果存储，与提取流程共用同一个实例；初始化失败时不影响提取功能，检索接口返回404
+try:
+    results_store = get_results_store()
+except Exception as e:
+    print(f"警告：历史结果存储初始化失败：{e}")
+    results_store = None
+
 @app.route('/api/extract', methods=['POST'])
 def extract_core_views():
     """提取UP主视频核心观点"""
@@ -30,12 +39,18 @@ def extract_core_views():
         # 声明全局变量
         global MODEL_TYPE, DEEPSEEK_API_KEY, SILICONFLOW_API_KEY
         
+        # 请求开始时间，预算模式下获取视频列表的耗时也计入时间预算
+        start_time = time.time()
+        
         # 获取请求参数
         data = request.json
         uid = data.get('uid')
         max_videos = data.get('max_videos', MAX_VIDEOS)
         model_type = data.get('model_type', MODEL_TYPE)
         api_keys = data.get('api_keys', {})
+        time_budget = data.get('time_budget')
+        token_budget = data.get('token_budget')
+        priority = data.get('priority', PRIORITY_POLICY)
         
         if not uid:
             return jsonify({
@@ -43,6 +58,27 @@ def extract_core_views():
                 'message': '缺少必填参数：uid'
             }), 400
         
+        # 校验预算参数，留空表示不限制
+        try:
+            time_budget = float(time_budget) if time_budget not in (None, '') else None
+            token_budget = int(token_budget) if token_budget not in (None, '') else None
+        except (TypeError, ValueError):
+            return jsonify({
+                'success': False,
+                'message': '参数格式错误：time_budget须为数字，token_budget须为整数'
+            }), 400
+        if (time_budget is not None and time_budget <= 0) or (token_budget is not None and token_budget <= 0):
+            return jsonify({
+                'success': False,
+                'message': '参数格式错误：time_budget和token_budget须大于0'
+            }), 400
+        
+        if priority not in PRIORITY_POLICIES:
+            return jsonify({
+                'success': False,
+                'message': f'不支持的优先级策略：{priority}，可选值：{", ".join(PRIORITY_POLICIES)}'
+            }), 400
+        
         # 更新配置
         original_model_type = MODEL_TYPE
         original_deepseek_key = DEEPSEEK_API_KEY
@@ -57,7 +93,7 @@ def extract_core_views():
             SILICONFLOW_API_KEY = api_keys.get('siliconflow')
         
         # 初始化爬虫
-        crawler = BilibiliUpCrawler(uid, max_videos)
+        crawler = BilibiliUpCrawler(uid, max_videos, model_type=model_type, api_keys=api_keys)
         
         # 获取视频列表
         print(f"正在获取UP主 {uid} 的视频列表...")
@@ -71,9 +107,18 @@ def extract_core_views():
                 'message': '没有获取到视频'
             }), 404
         
-        # 处理所有视频
-        print(f"开始处理 {len(crawler.videos)} 个视频...")
-        crawler.process_all_videos()
+        # 处理视频：设置了预算时按优先级处理，预算用尽后返回部分结果
+        coverage = None
+        if time_budget is not None or token_budget is not None:
+            coverage = crawler.process_videos_with_budget(
+                time_budget=time_budget,
+                token_budget=token_budget,
+                priority=priority,
+                start_time=start_time
+            )
+        else:
+            print(f"开始处理 {len(crawler.videos)} 个视频...")
+            crawler.process_all_videos()
         
         print(f"处理完成，共生成 {len(crawler.results)} 个结果")
         
@@ -91,7 +136,8 @@ def extract_core_views():
             'success': True,
             'results': crawler.results,
             'total': len(crawler.results),
-            'overall_summary': overall_summary
+            'overall_summary': overall_summary,
+            'coverage': coverage
         })
         
     except Exception as e:
@@ -134,6 +180,51 @@ def ask_question():
             'message': f'回答问题失败：{str(e)}'
         }), 500
 
+@app.route('/api/search', methods=['GET'])
+def search_results():
+    """按关键词、UP主和日期范围检索历史提取结果"""
+    if not results_store:
+        return jsonify({
+            'success': False,
+            'message': '历史结果存储未启用，请在config.py中设置ENABLE_RESULTS_STORE = True'
+        }), 404
+    
+    try:
+        keyword = request.args.get('q', '').strip()
+        uid = request.args.get('uid', '').strip()
+        start_date = request.args.get('start_date', '').strip()
+        end_date = request.args.get('end_date', '').strip()
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+        offset = max(int(request.args.get('offset', 0)), 0)
+        
+        start = time.time()
+        results, total = results_store.search(
+            keyword=keyword,
+            up_mid=uid or None,
+            start_date=start_date or None,
+            end_date=end_date or None,
+            limit=limit,
+            offset=offset
+        )
+        
+        return jsonify({
+            'success': True,
+            'results': results,
+            'total': total,
+            'took_ms': round((time.time() - start) * 1000, 2)
+        })
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': f'参数格式错误：{str(e)}'
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'检索失败：{str(e)}'
+        }), 500
+
 @app.route('/api/test', methods=['GET'])
 def test():
     """测试接口"""
@@ -4,6 +4,8 @@
 const uidInput = document.getElementById('uid');
 const maxVideosInput = document.getElementById('max-videos');
 const modelTypeSelect = document.getElementById('model-type');
+const timeBudgetInput = document.getElementById('time-budget');
+const prioritySelect = document.getElementById('priority');
 const extractBtn = document.getElementById('extract-btn');
 const statusSection = document.getElementById('status-section');
 const statusText = document.getElementById('status-text');
@@ -30,11 +32,132 @@ let currentUid = '';
 // 常量
 const API_BASE_URL = 'http://localhost:5000/api';
 const STORAGE_KEY = 'bilibili-up-views';
+const DB_NAME = 'bilibili-up-views';
+const DB_VERSION = 1;
+const HISTORY_STORE = 'history';  // 历史记录摘要（UID、时间、视频数），列表只读取这部分
+const HISTORY_RESULTS_STORE = 'history-results';  // 历史记录的完整结果，查看时才加载
+const SAVED_RESULTS_STORE = 'saved-results';
+const HISTORY_LIMIT = 100;
+
+// 虚拟列表：只渲染可视区域附近的条目，其余用上下占位元素撑开高度
+class VirtualList {
+    constructor(container, renderItem, options = {}) {
+        this.container = container;
+        this.renderItem = renderItem;
+        this.estimatedHeight = options.estimatedHeight || 200;
+        this.overscan = options.overscan || 5;
+        this.items = [];
+        this.heights = [];
+        this.start = 0;
+        this.end = 0;
+        this.frame = null;
+
+        this.container.classList.add('virtual-scroll');
+        this.container.addEventListener('scroll', () => this.scheduleRender());
+        window.addEventListener('resize', () => this.scheduleRender());
+    }
+
+    // 设置列表数据并回到顶部
+    setItems(items) {
+        this.items = items;
+        this.heights = new Array(items.length).fill(this.estimatedHeight);
+        this.start = 0;
+        this.end = 0;
+
+        this.container.innerHTML = '';
+        this.topSpacer = document.createElement('div');
+        this.rows = document.createElement('div');
+        this.bottomSpacer = document.createElement('div');
+        this.container.append(this.topSpacer, this.rows, this.bottomSpacer);
+        this.container.scrollTop = 0;
+
+        this.render();
+    }
+
+    // 合并同一帧内的多次滚动
+    scheduleRender() {
+        if (this.frame || !this.rows) {
+            return;
+        }
+        this.frame = requestAnimationFrame(() => {
+            this.frame = null;
+            this.render();
+        });
+    }
+
+    render() {
+        const viewTop = this.container.scrollTop;
+        const viewBottom = viewTop + (this.container.clientHeight || window.innerHeight);
+
+        // 找到可视区域内的条目范围
+        let start = 0;
+        let offset = 0;
+        while (start < this.items.length && offset + this.heights[start] < viewTop) {
+            offset += this.heights[start];
+            start++;
+        }
+        let end = start;
+        let bottom = offset;
+        while (end < this.items.length && bottom < viewBottom) {
+            bottom += this.heights[end];
+            end++;
+        }
+        start = Math.max(0, start - this.overscan);
+        end = Math.min(this.items.length, end + this.overscan);
+
+        if (start !== this.start || end !== this.end) {
+            this.start = start;
+            this.end = end;
+
+            const fragment = document.createDocumentFragment();
+            for (let i = start; i < end; i++) {
+                const row = document.createElement('div');
+                row.className = 'virtual-row';
+                row.dataset.index = i;
+                row.appendChild(this.renderItem(this.items[i], i));
+                fragment.appendChild(row);
+            }
+            this.rows.innerHTML = '';
+            this.rows.appendChild(fragment);
+        }
+
+        // 用实际渲染高度替换估计高度，高度有变化时再渲染一次以填满可视区域
+        let changed = false;
+        Array.from(this.rows.children).forEach(row => {
+            const index = Number(row.dataset.index);
+            if (this.heights[index] !== row.offsetHeight) {
+                this.heights[index] = row.offsetHeight;
+                changed = true;
+            }
+        });
+        if (changed) {
+            this.scheduleRender();
+        }
+
+        let topHeight = 0;
+        for (let i = 0; i < this.start; i++) {
+            topHeight += this.heights[i];
+        }
+        let bottomHeight = 0;
+        for (let i = this.end; i < this.items.length; i++) {
+            bottomHeight += this.heights[i];
+        }
+        this.topSpacer.style.height = `${topHeight}px`;
+        this.bottomSpacer.style.height = `${bottomHeight}px`;
+    }
+}
+
+// 结果卡片和历史记录列表
+const resultsList = new VirtualList(resultsGrid, (result, index) => createResultCard(result, index + 1), { estimatedHeight: 180 });
+const historyVirtualList = new VirtualList(historyList, item => createHistoryItem(item), { estimatedHeight: 85 });
+
+// 已展开的结果卡片序号，卡片滚出窗口后重新渲染时保持展开状态
+const expandedCards = new Set();
 
 // 初始化
 function init() {
-    // 加载历史记录
-    loadHistory();
+    // 加载历史记录（首次运行时从localStorage迁移）
+    migrateLocalStorageHistory().then(loadHistory);
 
     // 添加事件监听器
     extractBtn.addEventListener('click', handleExtract);
@@ -174,6 +297,8 @@ async function handleExtract() {
     const uid = uidInput.value.trim();
     const maxVideos = parseInt(maxVideosInput.value);
     const modelType = modelTypeSelect.value;
+    const timeBudget = parseInt(timeBudgetInput.value) || null;
+    const priority = prioritySelect.value;
 
     if (!uid) {
         showMessage('请输入UP主UID！', 'error');
@@ -200,6 +325,8 @@ async function handleExtract() {
                 uid: uid,
                 max_videos: maxVideos,
                 model_type: modelType,
+                time_budget: timeBudget,
+                priority: priority,
                 api_keys: {
                     deepseek: config.deepseekApiKey,
                     siliconflow: config.siliconflowApiKey
@@ -214,6 +341,13 @@ async function handleExtract() {
             progress.style.width = '100%';
             statusText.textContent = `提取完成，共处理 ${data.total} 个视频`;
 
+            // 预算模式下提前停止时提示覆盖率
+            if (data.coverage && data.coverage.stopped_reason !== 'completed') {
+                const percent = Math.round(data.coverage.coverage * 100);
+                const failed = data.coverage.failed_videos ? `，${data.coverage.failed_videos} 个提取失败` : '';
+                showMessage(`预算已用尽，已成功处理 ${data.coverage.processed_videos}/${data.coverage.total_videos} 个视频（${percent}%）${failed}，结果为部分结果`, 'warning');
+            }
+
             // 显示结果（包含整体总结）
             showResults(data.results, uid, data.overall_summary);
 
@@ -250,8 +384,8 @@ function showResults(results, uid, overallSummary) {
 
     resultsTitle.textContent = `UP主 ${uid} 视频核心观点（共 ${results.length} 个）`;
 
-    // 清空现有结果
-    resultsGrid.innerHTML = '';
+    // 清空展开状态
+    expandedCards.clear();
 
     // 显示整体总结
     const overallSummarySection = document.getElementById('overall-summary');
@@ -273,15 +407,12 @@ function showResults(results, uid, overallSummary) {
     // 显示智能问答区域
     aiChatSection.style.display = 'block';
 
-    // 添加结果卡片
-    results.forEach((result, index) => {
-        const card = createResultCard(result, index + 1);
-        resultsGrid.appendChild(card);
-    });
-
-    // 显示结果区域
+    // 显示结果区域（先显示再渲染，虚拟列表需要容器的实际高度）
     resultsSection.style.display = 'block';
 
+    // 添加结果卡片（只渲染可视区域内的卡片）
+    resultsList.setItems(results);
+
     // 滚动到结果区域
     resultsSection.scrollIntoView({ behavior: 'smooth' });
 }
@@ -331,6 +462,10 @@ function createResultCard(result, index) {
         </div>
     `;
 
+    if (expandedCards.has(index)) {
+        setCoreViewsExpanded(card.querySelector('.expand-btn'), true);
+    }
+
     return card;
 }
 
@@ -355,130 +490,259 @@ function formatCoreViews(text) {
 
 // 切换核心观点展开/折叠状态
 function toggleCoreViews(btn) {
+    const expanded = !btn.nextElementSibling.classList.contains('show');
+    setCoreViewsExpanded(btn, expanded);
+
+    // 记录展开状态并更新虚拟列表中的卡片高度
+    const row = btn.closest('.virtual-row');
+    if (row) {
+        const index = Number(row.dataset.index) + 1;
+        if (expanded) {
+            expandedCards.add(index);
+        } else {
+            expandedCards.delete(index);
+        }
+        resultsList.render();
+    }
+}
+
+// 设置核心观点展开/折叠状态
+function setCoreViewsExpanded(btn, expanded) {
     const content = btn.nextElementSibling;
-    const icon = btn.querySelector('i');
     const text = btn.querySelector('span');
 
-    if (content.classList.contains('show')) {
-        // 收起
-        content.classList.remove('show');
-        btn.classList.remove('expanded');
-        text.textContent = '展开查看全部';
-    } else {
+    if (expanded) {
         // 展开
         content.classList.add('show');
         btn.classList.add('expanded');
         text.textContent = '收起';
+    } else {
+        // 收起
+        content.classList.remove('show');
+        btn.classList.remove('expanded');
+        text.textContent = '展开查看全部';
     }
 }
 
 // 处理保存
-function handleSave() {
-    const results = document.querySelectorAll('.result-card');
-    if (results.length === 0) {
+async function handleSave() {
+    if (currentResults.length === 0) {
         showMessage('没有可保存的结果！', 'warning');
         return;
     }
 
-    // 获取结果数据
-    const data = Array.from(results).map(card => {
-        const title = card.querySelector('h3').textContent;
-        const meta = card.querySelector('.result-meta');
-        const date = meta.querySelector('span:first-child').textContent.replace('📅 ', '');
-        const link = meta.querySelector('a').href;
-        const coreViews = card.querySelector('.core-views').innerHTML;
-
-        return {
-            视频标题: title,
-            视频链接: link,
-            发布时间: date,
-            核心观点: coreViews
-        };
-    });
-
-    // 保存到浏览器本地存储，不触发下载
-    localStorage.setItem(`${STORAGE_KEY}-results`, JSON.stringify(data));
-
-    showMessage('结果已保存到浏览器本地存储！', 'success');
+    // 保存到浏览器IndexedDB，不触发下载，也不受localStorage容量限制
+    try {
+        await dbRequest(SAVED_RESULTS_STORE, 'readwrite', store => store.put({
+            uid: currentUid,
+            timestamp: new Date().toISOString(),
+            results: currentResults
+        }, 'latest'));
+        showMessage('结果已保存到浏览器本地存储！', 'success');
+    } catch (error) {
+        showMessage(`保存失败：${error.message}`, 'error');
+    }
 }
 
 // 处理清空
 function handleClear() {
     if (confirm('确定要清除所有结果吗？')) {
-        resultsGrid.innerHTML = '';
+        currentResults = [];
+        expandedCards.clear();
+        resultsList.setItems([]);
         resultsSection.style.display = 'none';
         showMessage('结果已清除！', 'success');
     }
 }
 
-// 保存到历史记录
-function saveToHistory(data) {
-    const history = getHistory();
-    history.unshift(data);
+// 打开IndexedDB数据库
+let dbPromise = null;
+function openDatabase() {
+    if (!dbPromise) {
+        dbPromise = new Promise((resolve, reject) => {
+            const request = indexedDB.open(DB_NAME, DB_VERSION);
+            request.onupgradeneeded = () => {
+                const db = request.result;
+                const historyStore = db.createObjectStore(HISTORY_STORE, { keyPath: 'id', autoIncrement: true });
+                historyStore.createIndex('timestamp', 'timestamp');
+                db.createObjectStore(HISTORY_RESULTS_STORE);
+                db.createObjectStore(SAVED_RESULTS_STORE);
+            };
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+    }
+    return dbPromise;
+}
+
+// 在单个对象仓库上执行操作，事务完成后返回请求结果
+async function dbRequest(storeName, mode, operation) {
+    const db = await openDatabase();
+    return new Promise((resolve, reject) => {
+        const tx = db.transaction(storeName, mode);
+        const request = operation(tx.objectStore(storeName));
+        tx.oncomplete = () => resolve(request ? request.result : undefined);
+        tx.onerror = () => reject(tx.error);
+        tx.onabort = () => reject(tx.error);
+    });
+}
+
+// 在一个事务中写入多条历史记录：摘要和完整结果分开存储，加载列表时不必解析所有结果
+async function addHistoryEntries(entries) {
+    const db = await openDatabase();
+    return new Promise((resolve, reject) => {
+        const tx = db.transaction([HISTORY_STORE, HISTORY_RESULTS_STORE], 'readwrite');
+        const ids = [];
+        entries.forEach(data => {
+            const request = tx.objectStore(HISTORY_STORE).add({
+                uid: data.uid,
+                timestamp: data.timestamp,
+                total: data.total
+            });
+            request.onsuccess = () => {
+                ids.push(request.result);
+                tx.objectStore(HISTORY_RESULTS_STORE).put({
+                    results: data.results,
+                    overall_summary: data.overall_summary || ''
+                }, request.result);
+            };
+        });
+        tx.oncomplete = () => resolve(ids);
+        tx.onerror = () => reject(tx.error);
+        tx.onabort = () => reject(tx.error);
+    });
+}
+
+// 写入一条历史记录
+async function addHistoryEntry(data) {
+    const ids = await addHistoryEntries([data]);
+    return ids[0];
+}
+
+// 删除一条历史记录（摘要和完整结果）
+async function deleteHistoryEntry(id) {
+    const db = await openDatabase();
+    return new Promise((resolve, reject) => {
+        const tx = db.transaction([HISTORY_STORE, HISTORY_RESULTS_STORE], 'readwrite');
+        tx.objectStore(HISTORY_STORE).delete(id);
+        tx.objectStore(HISTORY_RESULTS_STORE).delete(id);
+        tx.oncomplete = () => resolve();
+        tx.onerror = () => reject(tx.error);
+        tx.onabort = () => reject(tx.error);
+    });
+}
 
-    // 只保留最近10条记录
-    if (history.length > 10) {
-        history.pop();
+// 将旧版本保存在localStorage中的历史记录迁移到IndexedDB
+async function migrateLocalStorageHistory() {
+    // 旧版本「保存到本地」写入的结果已不再使用，直接释放localStorage空间
+    localStorage.removeItem(`${STORAGE_KEY}-results`);
+
+    const history = localStorage.getItem(STORAGE_KEY);
+    if (!history) {
+        return;
     }
 
-    localStorage.setItem(STORAGE_KEY, JSON.stringify(history));
+    try {
+        // 所有记录在同一个事务中写入，中途失败时整体回滚，下次加载重新迁移也不会产生重复记录；
+        // 旧记录按时间倒序保存，倒着写入以保持顺序
+        const entries = JSON.parse(history);
+        await addHistoryEntries(entries.reverse());
+        localStorage.removeItem(STORAGE_KEY);
+    } catch (error) {
+        console.error('迁移历史记录失败：', error);
+    }
+}
+
+// 保存到历史记录
+async function saveToHistory(data) {
+    try {
+        await addHistoryEntry(data);
+
+        // 只保留最近的记录
+        const history = await getHistory();
+        for (const item of history.slice(HISTORY_LIMIT)) {
+            await deleteHistoryEntry(item.id);
+        }
+    } catch (error) {
+        showMessage(`保存历史记录失败：${error.message}`, 'error');
+    }
     loadHistory();
 }
 
-// 获取历史记录
-function getHistory() {
-    const history = localStorage.getItem(STORAGE_KEY);
-    return history ? JSON.parse(history) : [];
+// 获取历史记录摘要（按时间倒序，不包含完整结果）
+async function getHistory() {
+    const history = await dbRequest(HISTORY_STORE, 'readonly', store => store.index('timestamp').getAll());
+    return history.reverse();
 }
 
 // 加载历史记录
-function loadHistory() {
-    const history = getHistory();
-    historyList.innerHTML = '';
+async function loadHistory() {
+    let history = [];
+    try {
+        history = await getHistory();
+    } catch (error) {
+        console.error('读取历史记录失败：', error);
+    }
 
     if (history.length === 0) {
+        historyVirtualList.setItems([]);
         historyList.innerHTML = '<p style="color: #666; text-align: center; padding: 20px;">暂无历史记录</p>';
         return;
     }
 
-    history.forEach((item, index) => {
-        const historyItem = document.createElement('div');
-        historyItem.className = 'history-item';
+    historyVirtualList.setItems(history);
+}
+
+// 创建历史记录条目
+function createHistoryItem(item) {
+    const historyItem = document.createElement('div');
+    historyItem.className = 'history-item';
 
-        const date = new Date(item.timestamp).toLocaleString();
+    const date = new Date(item.timestamp).toLocaleString();
 
-        historyItem.innerHTML = `
-            <div class="history-info">
-                <i class="fa fa-history"></i>
-                <div>
-                    <strong>UP主 ${item.uid}</strong>
-                    <div class="history-date">${date} · ${item.total} 个视频</div>
-                </div>
-            </div>
-            <div class="history-actions">
-                <button onclick="viewHistory(${index})"><i class="fa fa-eye"></i> 查看</button>
-                <button onclick="deleteHistory(${index})"><i class="fa fa-trash"></i> 删除</button>
+    historyItem.innerHTML = `
+        <div class="history-info">
+            <i class="fa fa-history"></i>
+            <div>
+                <strong>UP主 ${item.uid}</strong>
+                <div class="history-date">${date} · ${item.total} 个视频</div>
             </div>
-        `;
+        </div>
+        <div class="history-actions">
+            <button onclick="viewHistory(${item.id})"><i class="fa fa-eye"></i> 查看</button>
+            <button onclick="deleteHistory(${item.id})"><i class="fa fa-trash"></i> 删除</button>
+        </div>
+    `;
 
-        historyList.appendChild(historyItem);
-    });
+    return historyItem;
 }
 
-// 查看历史记录
-function viewHistory(index) {
-    const history = getHistory();
-    const item = history[index];
-    showResults(item.results, item.uid, item.overall_summary || '');
+// 查看历史记录（此时才加载完整结果）
+async function viewHistory(id) {
+    try {
+        const [item, data] = await Promise.all([
+            dbRequest(HISTORY_STORE, 'readonly', store => store.get(id)),
+            dbRequest(HISTORY_RESULTS_STORE, 'readonly', store => store.get(id))
+        ]);
+        if (!item || !data) {
+            showMessage('历史记录不存在！', 'error');
+            return;
+        }
+        showResults(data.results, item.uid, data.overall_summary || '');
+    } catch (error) {
+        showMessage(`读取历史记录失败：${error.message}`, 'error');
+    }
 }
 
 // 删除历史记录
-function deleteHistory(index) {
-    const history = getHistory();
-    history.splice(index, 1);
-    localStorage.setItem(STORAGE_KEY, JSON.stringify(history));
-    loadHistory();
-    showMessage('历史记录已删除！', 'success');
+async function deleteHistory(id) {
+    try {
+        await deleteHistoryEntry(id);
+        loadHistory();
+        showMessage('历史记录已删除！', 'success');
+    } catch (error) {
+        showMessage(`删除历史记录失败：${error.message}`, 'error');
+    }
 }
 
 // 显示消息